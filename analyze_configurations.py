@@ -3,7 +3,8 @@
 Analyze different false_cells configurations to find the one with the least solutions.
 """
 
-from geniusSquare import create_matrix, solve_puzzle
+from geniusSquare import (create_matrix, estimate_solutions, sample_solution_paths, solve_puzzle,
+                          summarize_estimate)
 from itertools import combinations
 import time
 
@@ -54,13 +55,74 @@ def analyze_configuration(false_cells, max_solutions=1000):
     except Exception as e:
         return None, f"Error: {str(e)}"
 
-def find_optimal_configurations(num_false_cells=7, sample_size=100):
+def estimate_configuration(false_cells, samples=500, seed=42):
+    """Estimate a configuration's number of solutions and a rough (low, high) band."""
+    matrix = create_matrix(false_cells)
+    return estimate_solutions(matrix, PIECES, samples=samples, seed=seed)
+
+def sample_configuration(false_cells, samples, batch=0):
+    """
+    Sample search paths for a configuration, returning (sum, sum of squares) of path weights.
+
+    The seed is derived from the configuration and batch number, so every
+    configuration and every refinement batch draws an independent sample.
+    """
+    matrix = create_matrix(false_cells)
+    seed = f"{','.join(false_cells)}:{batch}"
+    return sample_solution_paths(matrix, PIECES, samples, seed)
+
+def prerank_configurations(configurations, keep, samples=500, refine_factor=4):
+    """
+    Return roughly the `keep` configurations with the fewest solutions.
+
+    Configurations are ranked by the upper end of their estimated band, so a
+    noisy low estimate does not outrank a confident one. Zero estimates and
+    bands that straddle the cut-off get `refine_factor` times as many extra
+    samples, pooled with the first batch, before the final ranking, since
+    unlucky samples collapse toward 0 and would otherwise tie with
+    unsolvable boards.
+    """
+    pooled = []  # [total, total_sq, samples, false_cells]
+    for i, false_cells in enumerate(configurations):
+        if i % 500 == 0:
+            print(f"Estimating: {i}/{len(configurations)} ({i/len(configurations)*100:.1f}%)")
+        total, total_sq = sample_configuration(list(false_cells), samples)
+        pooled.append([total, total_sq, samples, false_cells])
+
+    def ranked():
+        estimates = []
+        for i, (total, total_sq, n, _) in enumerate(pooled):
+            estimate, (low, high) = summarize_estimate(total, total_sq, n)
+            estimates.append((high, estimate, low, i))
+        estimates.sort(key=lambda x: (x[0], x[1]))
+        return estimates
+
+    estimates = ranked()
+    if keep < len(estimates):
+        cutoff = estimates[keep - 1][0]
+        refine = [i for high, estimate, low, i in estimates if estimate == 0 or low <= cutoff < high]
+        print(f"Refining {len(refine)} uncertain estimates with {samples * refine_factor} more samples...")
+        for i in refine:
+            total, total_sq = sample_configuration(list(pooled[i][3]), samples * refine_factor, batch=1)
+            pooled[i][0] += total
+            pooled[i][1] += total_sq
+            pooled[i][2] += samples * refine_factor
+        estimates = ranked()
+
+    return [pooled[i][3] for _, _, _, i in estimates[:keep]]
+
+def find_optimal_configurations(num_false_cells=7, sample_size=100, prerank_keep=None, prerank_samples=500):
     """
     Find configurations with the least number of solutions.
 
     Args:
         num_false_cells: Number of cells to block (default 7 to match current setup)
         sample_size: Number of random configurations to test (None for all)
+        prerank_keep: If set, estimate solution counts for every configuration and
+            only solve exactly this many with the fewest estimated solutions. The
+            estimates are noisy, so this ranking is approximate and can drop some
+            genuinely low-solution boards; keep a generous margin.
+        prerank_samples: Random search paths per configuration when pre-ranking
     """
     all_cells = generate_all_cells()
 
@@ -83,6 +145,10 @@ def find_optimal_configurations(num_false_cells=7, sample_size=100):
         test_combinations = all_combinations
         print(f"Testing all {len(all_combinations)} configurations...")
 
+    if prerank_keep and prerank_keep < len(test_combinations):
+        print(f"Pre-ranking by estimated solutions, keeping the best {prerank_keep}...")
+        test_combinations = prerank_configurations(test_combinations, prerank_keep, prerank_samples)
+
     for i, false_cells in enumerate(test_combinations):
         if i % 50 == 0:
             print(f"Progress: {i}/{len(test_combinations)} ({i/len(test_combinations)*100:.1f}%)")
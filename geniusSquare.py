@@ -1,3 +1,7 @@
+import math
+import random
+
+
 def create_matrix(false_cells):
     """Create a 6x6 matrix where all cells are True except for specified false_cells."""
     rows = ['A', 'B', 'C', 'D', 'E', 'F']
@@ -125,6 +129,15 @@ def get_valid_placements(piece_name, piece_orientations, matrix):
     return list(set(placements))
 
 
+def get_piece_placements(matrix, pieces):
+    """Get all valid placements on the board for every piece, keyed by piece name."""
+    piece_placements = {}
+    for name, shape in pieces.items():
+        orientations = get_all_orientations(shape)
+        piece_placements[name] = get_valid_placements(name, orientations, matrix)
+    return piece_placements
+
+
 def solve_puzzle(matrix, pieces, find_all=True):
     """
     Find all solutions to place all pieces on the board.
@@ -141,11 +154,8 @@ def solve_puzzle(matrix, pieces, find_all=True):
                 available.add((row, col))
     
     # Precompute all valid placements for each piece
-    piece_placements = {}
-    for name, shape in pieces.items():
-        orientations = get_all_orientations(shape)
-        placements = get_valid_placements(name, orientations, matrix)
-        piece_placements[name] = placements
+    piece_placements = get_piece_placements(matrix, pieces)
+    for name, placements in piece_placements.items():
         print(f"Piece {name}: {len(placements)} valid placements")
     
     # Check if total piece cells equals available cells
@@ -202,3 +212,92 @@ def print_solution(matrix, solution, pieces, piece_colors=None):
             placement[cell] = piece_name  # Use piece name
 
     print_matrix(matrix, placement, piece_colors)
+
+
+def estimate_solutions(matrix, pieces, samples=1000, seed=None, z=1.96):
+    """
+    Estimate the number of solutions without enumerating them.
+
+    Uses Knuth's tree-size estimator (see sample_solution_paths) and returns
+    (estimate, (low, high)) where (low, high) is the estimate plus or minus z
+    sample standard errors, clipped at 0. Path weights are extremely
+    heavy-tailed, so this is only a rough band: with a few hundred samples it
+    misses the true count far more often than a normal 95% interval would, and
+    an unlucky run can return a tiny estimate with a tight band. Use many more
+    samples (tens of thousands) when the band itself matters.
+    """
+    total, total_sq = sample_solution_paths(matrix, pieces, samples, seed)
+    return summarize_estimate(total, total_sq, samples, z)
+
+
+def sample_solution_paths(matrix, pieces, samples, seed=None):
+    """
+    Sample random search paths and return the (sum, sum of squares) of their weights.
+
+    Each sample follows one random root-to-leaf path of the backtracking
+    search, and a path that places every piece has weight equal to the
+    product of the branching factors along it (0 otherwise). The mean weight
+    is an unbiased estimate of the solution count; returning the raw sums lets
+    callers pool several batches of samples.
+
+    Unlike solve_puzzle, each step branches on the remaining piece with the
+    fewest non-overlapping placements. Every solution is still reached by
+    exactly one path, but far fewer random paths dead-end, which keeps the
+    variance of the estimate usable.
+    """
+    if samples < 1:
+        raise ValueError(f"samples must be at least 1, got {samples}")
+
+    rows = ['A', 'B', 'C', 'D', 'E', 'F']
+    cols = [1, 2, 3, 4, 5, 6]
+
+    available = sum(1 for row in rows for col in cols if matrix[row][col])
+    total_piece_cells = sum(len(shape) for shape in pieces.values())
+    if total_piece_cells > available:
+        return 0.0, 0.0
+
+    piece_placements = get_piece_placements(matrix, pieces)
+    piece_names = list(pieces.keys())
+    rng = random.Random(seed)
+
+    total = 0.0
+    total_sq = 0.0
+    for _ in range(samples):
+        used_cells = frozenset()
+        remaining = list(piece_names)
+        weight = 1
+        while remaining:
+            # Branch on the most constrained piece (first in piece order on ties)
+            piece_name = None
+            children = None
+            for name in remaining:
+                fits = [p for p in piece_placements[name] if not p & used_cells]
+                if children is None or len(fits) < len(children):
+                    piece_name, children = name, fits
+                    if not fits:
+                        break
+            if not children:
+                weight = 0
+                break
+            weight *= len(children)
+            used_cells = used_cells | rng.choice(children)
+            remaining.remove(piece_name)
+        total += weight
+        total_sq += weight * weight
+
+    return total, total_sq
+
+
+def summarize_estimate(total, total_sq, samples, z=1.96):
+    """Turn pooled path-weight sums into (estimate, (low, high)) as in estimate_solutions."""
+    if samples < 1:
+        raise ValueError(f"samples must be at least 1, got {samples}")
+
+    mean = total / samples
+    if samples > 1:
+        variance = max(total_sq - samples * mean * mean, 0.0) / (samples - 1)
+        margin = z * math.sqrt(variance / samples)
+    else:
+        margin = float('inf')
+
+    return mean, (max(mean - margin, 0.0), mean + margin)
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Sharded sweeps over the configuration space using a shared directory.
+
+The configuration-rank space of a sweep is split into shards, each described
+by a small JSON manifest. Independent worker processes (on any host that can
+see the directory) claim shards, evaluate them and write per-shard result
+files. A merge step combines the result files into global top-k lists and
+statistics.
+
+Usage:
+    python sweep_shards.py plan  --dir sweep_dir --sweep all --shards 500
+    python sweep_shards.py work  --dir sweep_dir      # run on as many hosts as you like
+    python sweep_shards.py merge --dir sweep_dir
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import threading
+import time
+from math import comb
+
+from analyze_configurations import PIECES, generate_all_cells
+from test_constrained import generate_constrained_combinations, test_config
+
+SWEEPS = ('all', 'constrained')
+
+
+def unrank_combination(n, k, rank):
+    """Return the indices of the combination at position `rank` of combinations(range(n), k)."""
+    indices = []
+    start = 0
+    while k > 0:
+        for i in range(start, n):
+            block = comb(n - i - 1, k - 1)
+            if rank < block:
+                indices.append(i)
+                start = i + 1
+                k -= 1
+                break
+            rank -= block
+    return indices
+
+
+def next_combination(indices, n):
+    """Advance combination indices in place to the next in lexicographic order."""
+    k = len(indices)
+    for i in reversed(range(k)):
+        if indices[i] != i + n - k:
+            indices[i] += 1
+            for j in range(i + 1, k):
+                indices[j] = indices[j - 1] + 1
+            return True
+    return False
+
+
+def sweep_size(sweep, num_false_cells=7):
+    """Number of configurations in the rank space of a sweep."""
+    if sweep == 'all':
+        return comb(len(generate_all_cells()), num_false_cells)
+    if sweep == 'constrained':
+        return len(generate_constrained_combinations())
+    raise ValueError(f"Unknown sweep: {sweep}")
+
+
+def iter_configurations(sweep, start, stop, num_false_cells=7):
+    """Yield (rank, false_cells) for ranks in [start, stop) of a sweep."""
+    if sweep == 'all':
+        all_cells = generate_all_cells()
+        if start >= stop:
+            return
+        indices = unrank_combination(len(all_cells), num_false_cells, start)
+        for rank in range(start, stop):
+            yield rank, [all_cells[i] for i in indices]
+            if not next_combination(indices, len(all_cells)):
+                return
+    elif sweep == 'constrained':
+        all_combinations = generate_constrained_combinations()
+        for rank in range(start, min(stop, len(all_combinations))):
+            yield rank, all_combinations[rank]
+    else:
+        raise ValueError(f"Unknown sweep: {sweep}")
+
+
+def evaluate(sweep, false_cells):
+    """Return the solution count for a configuration, or None on failure."""
+    # Solve directly rather than through analyze_configuration, whose
+    # wall-clock timeout would drop the slowest (most-solution) boards and
+    # make the results depend on host load. The solver is chatty; keep
+    # worker output to progress lines only.
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, count = test_config(false_cells)
+    return count
+
+
+def manifest_path(directory, shard_id):
+    return os.path.join(directory, f"shard_{shard_id:05d}.json")
+
+
+def claim_path(directory, shard_id):
+    return os.path.join(directory, f"shard_{shard_id:05d}.claim")
+
+
+def result_path(directory, shard_id):
+    return os.path.join(directory, f"shard_{shard_id:05d}.result.json")
+
+
+def write_text_atomic(path, text):
+    """Write a file so readers on other hosts never see a partial or missing file."""
+    tmp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path, data):
+    write_text_atomic(path, json.dumps(data))
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_shards(directory):
+    """Return the sorted shard ids that have a manifest in the directory."""
+    shard_ids = []
+    for name in os.listdir(directory):
+        if name.startswith('shard_') and name.endswith('.json') and not name.endswith('.result.json'):
+            shard_ids.append(int(name[len('shard_'):-len('.json')]))
+    return sorted(shard_ids)
+
+
+def plan_shards(directory, sweep='all', num_shards=100, top_k=10, num_false_cells=7,
+                start=0, stop=None):
+    """Split ranks [start, stop) of a sweep's rank space into shard manifests in `directory`."""
+    # Every board must leave exactly as many open cells as the pieces cover
+    piece_cells = sum(len(shape) for shape in PIECES.values())
+    if sweep == 'all' and len(generate_all_cells()) - num_false_cells != piece_cells:
+        raise ValueError(f"{num_false_cells} blocked cells leave room for "
+                         f"{len(generate_all_cells()) - num_false_cells} piece cells, need {piece_cells}")
+    if start < 0:
+        raise ValueError(f"start must not be negative, got {start}")
+
+    os.makedirs(directory, exist_ok=True)
+    if list_shards(directory):
+        raise ValueError(f"{directory} already contains shard manifests")
+
+    size = sweep_size(sweep, num_false_cells)
+    stop = size if stop is None else min(stop, size)
+    total = stop - start
+    if total <= 0:
+        raise ValueError(f"Empty rank range [{start}, {stop})")
+    num_shards = max(1, min(num_shards, total))
+    shard_size = (total + num_shards - 1) // num_shards
+
+    shard_id = 0
+    for shard_start in range(start, stop, shard_size):
+        manifest = {
+            'shard': shard_id,
+            'sweep': sweep,
+            'num_false_cells': num_false_cells,
+            'start': shard_start,
+            'stop': min(shard_start + shard_size, stop),
+            'top_k': top_k,
+        }
+        write_json_atomic(manifest_path(directory, shard_id), manifest)
+        shard_id += 1
+
+    print(f"Planned {shard_id} shards of up to {shard_size:,} configurations ({total:,} total)")
+    return shard_id
+
+
+def takeover_path(directory, shard_id):
+    return os.path.join(directory, f"shard_{shard_id:05d}.takeover")
+
+
+def claim_text():
+    return f"{socket.gethostname()}:{os.getpid()} {time.time():.0f}\n"
+
+
+def try_claim(directory, shard_id, stale_after=None):
+    """Atomically claim a shard. Returns True if this process now owns it."""
+    path = claim_path(directory, shard_id)
+
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        if stale_after is None:
+            return False
+        return try_takeover(directory, shard_id, stale_after)
+    with os.fdopen(fd, 'w') as f:
+        f.write(claim_text())
+    return True
+
+
+def try_takeover(directory, shard_id, stale_after):
+    """
+    Take over the claim of a worker that appears to have died.
+
+    Takeovers of a shard are serialised by an O_EXCL takeover lock, and the
+    stale claim is replaced in a single os.replace, so the claim file never
+    disappears and plain claimers cannot slip in. If a worker dies while
+    holding the lock (a window of a few file operations), the lock stays
+    behind and blocks takeovers of that shard until it is deleted by hand.
+    """
+    path = claim_path(directory, shard_id)
+    lock = takeover_path(directory, shard_id)
+
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(claim_text())
+        # Re-check under the lock: the claim may have been refreshed or
+        # already taken over since we failed to create it
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except FileNotFoundError:
+            age = None
+        if age is not None and age <= stale_after:
+            return False
+        write_text_atomic(path, claim_text())
+        return True
+    finally:
+        os.remove(lock)
+
+
+def heartbeat(path, interval, stop):
+    """Touch `path` every `interval` seconds until `stop` is set."""
+    while not stop.wait(interval):
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+
+
+def run_shard(directory, manifest, progress_interval=1000, heartbeat_interval=60):
+    """Evaluate every configuration of a shard and write its result file."""
+    claim = claim_path(directory, manifest['shard'])
+
+    # Keep the claim fresh from a background thread so other workers don't
+    # treat it as stale, however long a single solve takes
+    stop_heartbeat = threading.Event()
+    heartbeat_thread = threading.Thread(target=heartbeat, args=(claim, heartbeat_interval, stop_heartbeat),
+                                        daemon=True)
+    heartbeat_thread.start()
+    try:
+        result = sweep_shard(manifest, progress_interval)
+    finally:
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+
+    write_json_atomic(result_path(directory, manifest['shard']), result)
+    return result
+
+
+def sweep_shard(manifest, progress_interval=1000):
+    """Evaluate every configuration of a shard and return its result."""
+    sweep = manifest['sweep']
+    top_k = manifest['top_k']
+
+    fewest = []  # (count, rank, false_cells), ascending
+    most = []    # (count, rank, false_cells), descending
+    tested = errors = total_solutions = 0
+    min_solutions = max_solutions = None
+
+    start_time = time.time()
+    for rank, false_cells in iter_configurations(sweep, manifest['start'], manifest['stop'],
+                                                  manifest['num_false_cells']):
+        count = evaluate(sweep, false_cells)
+
+        if count is None:
+            errors += 1
+        else:
+            tested += 1
+            total_solutions += count
+            min_solutions = count if min_solutions is None else min(min_solutions, count)
+            max_solutions = count if max_solutions is None else max(max_solutions, count)
+
+            fewest.append((count, rank, false_cells))
+            fewest.sort(key=lambda x: (x[0], x[1]))
+            del fewest[top_k:]
+            most.append((count, rank, false_cells))
+            most.sort(key=lambda x: (-x[0], x[1]))
+            del most[top_k:]
+
+        if (tested + errors) % progress_interval == 0:
+            print(f"  shard {manifest['shard']}: {tested + errors:,}/"
+                  f"{manifest['stop'] - manifest['start']:,} done")
+
+    result = {
+        'shard': manifest['shard'],
+        'sweep': sweep,
+        'start': manifest['start'],
+        'stop': manifest['stop'],
+        'tested': tested,
+        'errors': errors,
+        'total_solutions': total_solutions,
+        'min_solutions': min_solutions,
+        'max_solutions': max_solutions,
+        'fewest': fewest,
+        'most': most,
+        'host': socket.gethostname(),
+        'elapsed': time.time() - start_time,
+    }
+    return result
+
+
+def work(directory, stale_after=None, max_shards=None):
+    """Claim and complete shards until none are left. Returns shards completed."""
+    completed = 0
+    for shard_id in list_shards(directory):
+        if max_shards is not None and completed >= max_shards:
+            break
+        if os.path.exists(result_path(directory, shard_id)):
+            continue
+        if not try_claim(directory, shard_id, stale_after):
+            continue
+        # Another worker may have finished it between our check and the claim
+        if os.path.exists(result_path(directory, shard_id)):
+            continue
+
+        manifest = read_json(manifest_path(directory, shard_id))
+        print(f"Claimed shard {shard_id} ({manifest['start']:,}-{manifest['stop']:,})")
+        heartbeat_interval = stale_after / 3 if stale_after is not None else 60
+        result = run_shard(directory, manifest, heartbeat_interval=heartbeat_interval)
+        print(f"Finished shard {shard_id}: {result['tested']} tested, "
+              f"{result['errors']} errors in {result['elapsed']:.2f}s")
+        completed += 1
+    return completed
+
+
+def merge_results(directory, top_k=None):
+    """Combine per-shard result files into global top-k lists and statistics."""
+    shard_ids = list_shards(directory)
+    fewest = []
+    most = []
+    tested = errors = total_solutions = 0
+    min_solutions = max_solutions = None
+    missing = []
+
+    for shard_id in shard_ids:
+        path = result_path(directory, shard_id)
+        if not os.path.exists(path):
+            missing.append(shard_id)
+            continue
+        result = read_json(path)
+        if top_k is None:
+            top_k = read_json(manifest_path(directory, shard_id))['top_k']
+
+        tested += result['tested']
+        errors += result['errors']
+        total_solutions += result['total_solutions']
+        if result['min_solutions'] is not None:
+            min_solutions = result['min_solutions'] if min_solutions is None else min(min_solutions, result['min_solutions'])
+            max_solutions = result['max_solutions'] if max_solutions is None else max(max_solutions, result['max_solutions'])
+
+        fewest.extend(tuple(x) for x in result['fewest'])
+        most.extend(tuple(x) for x in result['most'])
+
+    fewest.sort(key=lambda x: (x[0], x[1]))
+    most.sort(key=lambda x: (-x[0], x[1]))
+
+    return {
+        'shards': len(shard_ids),
+        'missing': missing,
+        'tested': tested,
+        'errors': errors,
+        'min_solutions': min_solutions,
+        'max_solutions': max_solutions,
+        'avg_solutions': total_solutions / tested if tested else None,
+        'fewest': fewest[:top_k],
+        'most': most[:top_k],
+    }
+
+
+def print_merged(merged):
+    """Print merged results in the same layout as the single-host scripts."""
+    print(f"\n=== Top {len(merged['fewest'])} Configurations with Fewest Solutions ===")
+    for i, (count, rank, cells) in enumerate(merged['fewest']):
+        print(f"{i+1:2d}. {count:3d} solutions - {cells} (rank {rank})")
+
+    print(f"\n=== Top {len(merged['most'])} Configurations with Most Solutions ===")
+    for i, (count, rank, cells) in enumerate(merged['most']):
+        print(f"{i+1:2d}. {count:3d} solutions - {cells} (rank {rank})")
+
+    print(f"\n=== Statistics ===")
+    print(f"Shards merged: {merged['shards'] - len(merged['missing'])}/{merged['shards']}")
+    if merged['missing']:
+        print(f"Missing shards: {merged['missing']}")
+    print(f"Configurations tested: {merged['tested']}")
+    print(f"Errors: {merged['errors']}")
+    if merged['tested']:
+        print(f"Minimum solutions: {merged['min_solutions']}")
+        print(f"Maximum solutions: {merged['max_solutions']}")
+        print(f"Average solutions: {merged['avg_solutions']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = subparsers.add_parser('plan', help='write shard manifests')
+    plan_parser.add_argument('--dir', required=True, help='shared sweep directory')
+    plan_parser.add_argument('--sweep', choices=SWEEPS, default='all')
+    plan_parser.add_argument('--shards', type=int, default=100)
+    plan_parser.add_argument('--top-k', type=int, default=10)
+    plan_parser.add_argument('--start', type=int, default=0, help='first rank to include')
+    plan_parser.add_argument('--stop', type=int, default=None, help='rank to stop before')
+
+    work_parser = subparsers.add_parser('work', help='claim and complete shards')
+    work_parser.add_argument('--dir', required=True, help='shared sweep directory')
+    work_parser.add_argument('--stale-after', type=float, default=None,
+                             help='seconds after which an idle claim may be taken over; '
+                                  'live claims are refreshed every third of this')
+    work_parser.add_argument('--max-shards', type=int, default=None)
+
+    merge_parser = subparsers.add_parser('merge', help='combine shard results')
+    merge_parser.add_argument('--dir', required=True, help='shared sweep directory')
+    merge_parser.add_argument('--top-k', type=int, default=None)
+    merge_parser.add_argument('--json', help='also write the merged results to this file')
+
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        plan_shards(args.dir, args.sweep, args.shards, args.top_k, start=args.start, stop=args.stop)
+    elif args.command == 'work':
+        completed = work(args.dir, args.stale_after, args.max_shards)
+        print(f"Worker done: completed {completed} shards")
+    elif args.command == 'merge':
+        merged = merge_results(args.dir, args.top_k)
+        print_merged(merged)
+        if args.json:
+            write_json_atomic(args.json, merged)
+
+
+if __name__ == "__main__":
+    main()